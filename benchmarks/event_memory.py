@@ -0,0 +1,74 @@
+"""Measures per-event memory overhead of queued log events.
+
+Compares the old representation (a decoded str per line, turned into a
+{"message", "timestamp"} dict) with LogEventQueue, which keeps raw bytes in
+array-backed batches. Run from the repository root:
+
+    python -m benchmarks.event_memory --events 1000000 --line-size 80
+"""
+import argparse
+import datetime
+import gc
+import queue
+import tracemalloc
+
+from src.events import LogEventQueue
+
+
+def line(index: int, size: int) -> bytes:
+    prefix = f"{index} ".encode("utf-8")
+    return prefix + b"x" * max(size - len(prefix) - 1, 0) + b"\n"
+
+
+def measure(build, events: int, line_size: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    holder = build(events, line_size)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del holder
+    return current
+
+
+def build_str_queue(events: int, line_size: int):
+    log_queue = queue.Queue()
+    for index in range(events):
+        log_queue.put(line(index, line_size).decode("utf-8"))
+    return log_queue
+
+
+def build_dict_events(events: int, line_size: int):
+    return [
+        {"message": line(index, line_size).decode("utf-8"),
+         "timestamp": int(datetime.datetime.now().timestamp() * 1000)}
+        for index in range(events)
+    ]
+
+
+def build_event_queue(events: int, line_size: int):
+    log_queue = LogEventQueue()
+    for index in range(events):
+        log_queue.put(line(index, line_size))
+    return log_queue
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--line-size", type=int, default=80)
+    arguments = parser.parse_args()
+
+    payload = arguments.events * arguments.line_size
+    print(f"{arguments.events} events, {arguments.line_size} bytes each, {payload / 2 ** 20:.1f} MiB payload")
+    for name, build in (
+        ("queue.Queue of str", build_str_queue),
+        ("list of event dicts", build_dict_events),
+        ("LogEventQueue", build_event_queue),
+    ):
+        used = measure(build, arguments.events, arguments.line_size)
+        overhead = (used - payload) / arguments.events
+        print(f"{name:<22} {used / 2 ** 20:>9.1f} MiB  {overhead:>7.1f} bytes/event overhead")
+
+
+if __name__ == "__main__":
+    main()
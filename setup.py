@@ -5,7 +5,8 @@ BASE_DEPS = (
     "boto3==1.34.139",
     "botocore==1.34.139",
     "pydantic==2.8.2",
-    "aioboto3==13.1.1"
+    "aioboto3==13.1.1",
+    "PyYAML==6.0.1"
 )
 
 setup(
@@ -18,6 +19,7 @@ setup(
     packages = find_packages(),
     python_requires=">=3.12",
     install_requires=BASE_DEPS,
+    extras_require={"numpy": ["numpy>=1.26"]},
     classifiers=[
         "Programming Language :: Python :: 3.12",
         "License :: OSI Approved :: MIT License",
@@ -13,3 +13,7 @@ class DockerServerQueryError(Exception):
 class DockerClientQueryError(Exception):
     pass
 
+
+class CloudLogsSendError(Exception):
+    pass
+
@@ -0,0 +1,133 @@
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# PutLogEvents limits: at most 10000 events per call and 1 MiB per call,
+# where every event costs its utf-8 size plus 26 bytes
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_BYTES = 1048576
+EVENT_OVERHEAD_BYTES = 26
+
+
+def now_millis() -> int:
+    return time.time_ns() // 1000000
+
+
+def decode_message(message: bytes) -> str:
+    # backslashreplace keeps invalid bytes visible without growing them past 4 bytes each
+    return message.decode("utf-8", errors="backslashreplace")
+
+
+def encoded_size(message: bytes) -> int:
+    """Size of the message once decoded and sent as utf-8, which is what PutLogEvents counts."""
+    if message.isascii():
+        return len(message)
+    try:
+        message.decode("utf-8")
+        return len(message)
+    except UnicodeDecodeError:
+        return len(decode_message(message).encode("utf-8"))
+
+
+class LogEventBatch:
+    """Array-backed batch of log events.
+
+    Messages are kept as raw bytes in one shared buffer, their end offsets
+    and timestamps live in typed arrays, so a queued event costs 16 bytes
+    on top of its payload instead of a str object plus a dict.
+    """
+
+    __slots__ = ("_buffer", "_offsets", "_timestamps", "_encoded_size")
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = array("Q")
+        self._timestamps = array("q")
+        self._encoded_size = 0
+
+    @classmethod
+    def from_messages(
+        cls, messages: Iterable[Union[str, bytes]], timestamp: Optional[int] = None
+    ) -> "LogEventBatch":
+        batch = cls()
+        timestamp = now_millis() if timestamp is None else timestamp
+        for message in messages:
+            if isinstance(message, str):
+                message = message.encode("utf-8")
+            batch.append(message, timestamp)
+        return batch
+
+    def append(self, message: bytes, timestamp: Optional[int] = None, size: Optional[int] = None) -> None:
+        """Adds one event, size is its encoded_size() if the caller already knows it."""
+        self._buffer += message
+        self._encoded_size += encoded_size(message) if size is None else size
+        self._offsets.append(len(self._buffer))
+        self._timestamps.append(now_millis() if timestamp is None else timestamp)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __iter__(self) -> Iterator[Tuple[bytes, int]]:
+        start = 0
+        buffer = memoryview(self._buffer)
+        for end, timestamp in zip(self._offsets, self._timestamps):
+            yield bytes(buffer[start:end]), timestamp
+            start = end
+
+    @property
+    def payload_size(self) -> int:
+        return self._encoded_size + EVENT_OVERHEAD_BYTES * len(self)
+
+    def to_cloudwatch_events(self) -> List[Dict[str, Union[str, int]]]:
+        return [
+            {"message": decode_message(message), "timestamp": timestamp}
+            for message, timestamp in self
+        ]
+
+
+class LogEventQueue:
+    """Thread-safe queue of raw log lines grouped into PutLogEvents-sized batches.
+
+    Producers put single lines, consumers take whole batches. Once the batch
+    being filled reaches either CloudWatch limit it is sealed, so a backlog
+    is drained in order without re-copying the remaining events.
+    """
+
+    def __init__(self, max_events: int = MAX_BATCH_EVENTS, max_bytes: int = MAX_BATCH_BYTES):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self._sealed: Deque[LogEventBatch] = deque()
+        self._current = LogEventBatch()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def put(self, message: bytes, timestamp: Optional[int] = None) -> None:
+        size = encoded_size(message)
+        with self._not_empty:
+            if len(self._current) and (
+                len(self._current) >= self.max_events
+                or self._current.payload_size + size + EVENT_OVERHEAD_BYTES > self.max_bytes
+            ):
+                self._sealed.append(self._current)
+                self._current = LogEventBatch()
+            self._current.append(message, timestamp, size)
+            self._not_empty.notify()
+
+    def get_batch(self, timeout: Optional[float] = None) -> LogEventBatch:
+        """Returns the oldest batch, an empty one if nothing arrived within timeout."""
+        with self._not_empty:
+            if not self._sealed and not len(self._current):
+                self._not_empty.wait(timeout)
+            if self._sealed:
+                return self._sealed.popleft()
+            batch, self._current = self._current, LogEventBatch()
+            return batch
+
+    def empty(self) -> bool:
+        with self._not_empty:
+            return not self._sealed and not len(self._current)
+
+    def __len__(self) -> int:
+        with self._not_empty:
+            return sum(len(batch) for batch in self._sealed) + len(self._current)
@@ -0,0 +1,177 @@
+import datetime
+import math
+import re
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TIMESTAMP_FIELDS = ("@timestamp", "@ingestionTime")
+# fields which are never numbers, no need to try parsing them
+TEXT_FIELDS = ("@message", "@ptr", "@log", "@logStream")
+MISSING_TIMESTAMP = -1
+# only plain decimals become numbers, ids like "00123" or "1e10" stay text
+DECIMAL_PATTERN = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?")
+# float64 holds 15 significant digits exactly
+MAX_DECIMAL_DIGITS = 15
+
+Column = Union[array, List[Optional[str]], Any]
+ColumnType = Literal["timestamp", "number", "text"]
+
+
+@lru_cache(maxsize=1024)
+def _day_start_millis(day: str) -> int:
+    date = datetime.date.fromisoformat(day)
+    return (date - datetime.date(1970, 1, 1)).days * 86400000
+
+
+def parse_insights_timestamp(value: str) -> int:
+    """Parses Insights "YYYY-MM-DD HH:MM:SS.mmm" (UTC) timestamps into epoch milliseconds."""
+    if value.isdigit():
+        return int(value)
+    if len(value) == 23 and value[10] in " T":
+        return (
+            _day_start_millis(value[:10])
+            + int(value[11:13]) * 3600000
+            + int(value[14:16]) * 60000
+            + int(value[17:19]) * 1000
+            + int(value[20:23])
+        )
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return round(parsed.timestamp() * 1000)
+
+
+def _timestamp_column(values: Sequence[Optional[str]]) -> Column:
+    if numpy is not None and all(value is not None and not value.isdigit() for value in values):
+        try:
+            return numpy.array(values, dtype="datetime64[ms]").astype("int64")
+        except ValueError:
+            pass
+    column = array("q", (MISSING_TIMESTAMP if value is None else parse_insights_timestamp(value) for value in values))
+    return numpy.frombuffer(column, dtype="int64") if numpy is not None else column
+
+
+def is_plain_decimal(value: str) -> bool:
+    if DECIMAL_PATTERN.fullmatch(value) is None:
+        return False
+    return len(value.lstrip("-").replace(".", "").lstrip("0")) <= MAX_DECIMAL_DIGITS
+
+
+def _numeric_column(values: Sequence[Optional[str]], strict: bool = True) -> Optional[Column]:
+    """Returns a float64 column, None if strict and a value is not a plain decimal."""
+    column = array("d")
+    for value in values:
+        if value is None:
+            column.append(math.nan)
+        elif not strict or is_plain_decimal(value):
+            column.append(float(value))
+        else:
+            return None
+    return numpy.frombuffer(column, dtype="float64") if numpy is not None else column
+
+
+class InsightsColumns:
+    """Insights query results in columnar form, one typed column per field.
+
+    Timestamp fields are int64 epoch milliseconds (MISSING_TIMESTAMP where a
+    row has no value), fields whose values are all plain decimals are float64
+    with NaN for missing values, everything else is a list of str or None.
+    Columns are NumPy arrays when NumPy is installed, array.array otherwise.
+    """
+
+    def __init__(self, columns: Dict[str, Column], rows: int):
+        self.columns = columns
+        self.rows = rows
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, field: str) -> Column:
+        return self.columns[field]
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.columns
+
+    def count_by_time_bucket(self, bucket_seconds: float, field: str = "@timestamp") -> List[Tuple[int, int]]:
+        """Returns (bucket start in epoch milliseconds, number of rows) sorted by time."""
+        bucket = int(bucket_seconds * 1000)
+        if bucket < 1:
+            raise ValueError(f"bucket_seconds must be at least 0.001, got {bucket_seconds}")
+        timestamps = self.columns[field]
+        if numpy is not None:
+            timestamps = timestamps[timestamps != MISSING_TIMESTAMP]
+            starts, counts = numpy.unique(timestamps // bucket * bucket, return_counts=True)
+            return list(zip(starts.tolist(), counts.tolist()))
+        counts = Counter(timestamp // bucket * bucket for timestamp in timestamps if timestamp != MISSING_TIMESTAMP)
+        return sorted(counts.items())
+
+    def top_messages(self, limit: int = 10, field: str = "@message") -> List[Tuple[str, int]]:
+        """Returns the most frequent values of a text field with their counts."""
+        return Counter(value for value in self.columns[field] if value is not None).most_common(limit)
+
+
+class InsightsResultDecoder:
+    """Turns pages of Insights results, as returned by get_logs, into InsightsColumns.
+
+    Every page is folded into per-field value lists as it is added, so the
+    raw [{"field", "value"}, ...] rows can be released page by page.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._values: Dict[str, List[Optional[str]]] = {}
+
+    def add_page(self, results: Iterable[Iterable[Dict[str, str]]]) -> None:
+        values = self._values
+        rows = self.rows
+        for row in results:
+            for cell in row:
+                column = values.get(cell["field"])
+                if column is None:
+                    column = values[cell["field"]] = []
+                if len(column) < rows:
+                    column.extend([None] * (rows - len(column)))
+                column.append(cell.get("value"))
+            rows += 1
+        self.rows = rows
+
+    def decode(self, dtypes: Optional[Dict[str, ColumnType]] = None) -> InsightsColumns:
+        """Builds the columns, dtypes forces the type of a field instead of guessing it."""
+        dtypes = dtypes or {}
+        columns: Dict[str, Column] = {}
+        for field, values in self._values.items():
+            if len(values) < self.rows:
+                values.extend([None] * (self.rows - len(values)))
+            dtype = dtypes.get(field)
+            if dtype is None:
+                dtype = "timestamp" if field in TIMESTAMP_FIELDS else "text" if field in TEXT_FIELDS else None
+            if dtype == "timestamp":
+                columns[field] = _timestamp_column(values)
+            elif dtype == "text":
+                columns[field] = values
+            elif dtype == "number":
+                columns[field] = _numeric_column(values, strict=False)
+            else:
+                numeric = _numeric_column(values)
+                columns[field] = values if numeric is None else numeric
+        return InsightsColumns(columns, self.rows)
+
+
+def decode_insights_results(
+    *pages: Iterable[Iterable[Dict[str, str]]], dtypes: Optional[Dict[str, ColumnType]] = None
+) -> InsightsColumns:
+    decoder = InsightsResultDecoder()
+    for page in pages:
+        decoder.add_page(page)
+    return decoder.decode(dtypes)
@@ -2,12 +2,25 @@ import argparse
 import asyncio
 import datetime
 import logging
+import sys
 
+from src.manifest import ManifestRunner, format_report, load_manifest
+from src.metrics import MetricExtractor, load_metrics_config
+from src.profiling import Profiler
 from src.services import AsyncAwsCloudWatchService, DockerDeploymentService
 from src.usecases import AsyncAwsLogsUseCase
 from src.validation import DockerCredentials, ProgramArguments
 
 
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-dir", type=str, default="ccru-profile")
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--metrics-config", type=str, required=False)
+
+
 def get_cli_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument("--docker-image", type=str, required=True)
@@ -19,21 +32,83 @@ def get_cli_arguments():
     parser.add_argument("--aws-region", type=str, required=True)
     parser.add_argument("--docker-username", type=str, required=False)
     parser.add_argument("--docker-password", type=str, required=False)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
     return parser.parse_args()
 
 
+def get_manifest_cli_arguments(argv):
+    parser = argparse.ArgumentParser(prog="ccru run-manifest")
+    parser.add_argument("manifest", type=str)
+    parser.add_argument("--concurrency", type=int, required=False)
+    parser.add_argument("--aws-access-key-id", type=str, required=False)
+    parser.add_argument("--aws-secret-key", type=str, required=False)
+    parser.add_argument("--aws-region", type=str, required=False)
+    parser.add_argument("--docker-username", type=str, required=False)
+    parser.add_argument("--docker-password", type=str, required=False)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    arguments = parser.parse_args(argv)
+
+    manifest = load_manifest(arguments.manifest)
+    overrides = {
+        key: getattr(arguments, key)
+        for key in ("concurrency", "aws_access_key_id", "aws_secret_key", "aws_region")
+        if getattr(arguments, key) is not None
+    }
+    if arguments.metrics_config is not None:
+        overrides["metrics"] = load_metrics_config(arguments.metrics_config)
+    manifest = manifest.model_copy(update=overrides)
+    missing = [
+        key for key in ("aws_access_key_id", "aws_secret_key", "aws_region") if getattr(manifest, key) is None
+    ]
+    if missing:
+        parser.error(f"{', '.join(missing)} must be set in the manifest or on the command line")
+    if manifest.concurrency < 1:
+        parser.error("concurrency must be at least 1")
+    docker_credentials = DockerCredentials(username=arguments.docker_username, password=arguments.docker_password)
+    return manifest, docker_credentials, Profiler(arguments.profile_dir, enabled=arguments.profile)
+
+
+def run_manifest(argv):
+    manifest, docker_credentials, profiler = get_manifest_cli_arguments(argv)
+    profiler.start()
+    try:
+        results = ManifestRunner(manifest, docker_credentials, profiler).run()
+    finally:
+        profiler.stop()
+    print(format_report(results))
+    if any(result.exit_code != 0 for result in results):
+        sys.exit(1)
+
+
 def main():
     logging.basicConfig(level=logging.INFO)
 
+    if len(sys.argv) > 1 and sys.argv[1] == "run-manifest":
+        run_manifest(sys.argv[2:])
+        return
+
     arguments = get_cli_arguments()
     validated_arguments = ProgramArguments(**vars(arguments))
     docker_arguments = DockerCredentials(**vars(arguments))
 
-    aws_cloudwatch_service = AsyncAwsCloudWatchService(validated_arguments)
+    metrics = None
+    if arguments.metrics_config is not None:
+        metrics = MetricExtractor(load_metrics_config(arguments.metrics_config))
+
+    aws_cloudwatch_service = AsyncAwsCloudWatchService(validated_arguments, emf=metrics is not None)
     container_service = DockerDeploymentService(docker_arguments)
-    logs_monitoring_usecase = AsyncAwsLogsUseCase(container_service, aws_cloudwatch_service, validated_arguments)
+    profiler = Profiler(arguments.profile_dir, enabled=arguments.profile)
+    logs_monitoring_usecase = AsyncAwsLogsUseCase(
+        container_service, aws_cloudwatch_service, validated_arguments, profiler, metrics
+    )
 
     start_time = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)).timestamp()
     loop_coro = logs_monitoring_usecase.loop(validated_arguments.docker_image, validated_arguments.bash_command)
-    asyncio.run(loop_coro)
+    profiler.start()
+    try:
+        asyncio.run(loop_coro)
+    finally:
+        profiler.stop()
     end_time = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=1)).timestamp()
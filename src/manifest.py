@@ -0,0 +1,135 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+
+import yaml
+from botocore.client import BaseClient
+from docker import DockerClient
+
+from src.metrics import MetricExtractor
+from src.profiling import Profiler
+from src.services import (
+    AwsCloudWatchService,
+    DockerDeploymentService,
+    ICloudMonitoringService,
+    IContainerDeploymentService,
+    create_aws_logs_client,
+    create_docker_client,
+    setup_aws_log_group,
+)
+from src.usecases import AwsCloudWatchUseCase
+from src.validation import (
+    DockerCredentials,
+    JobManifest,
+    JobResult,
+    ManifestJob,
+    ProgramArguments,
+)
+
+
+def load_manifest(path: str) -> JobManifest:
+    with open(path) as manifest_file:
+        return JobManifest(**yaml.safe_load(manifest_file))
+
+
+class ManifestRunner:
+    """Runs every manifest job in its own container and CloudWatch stream.
+
+    Jobs share one Docker client and one CloudWatch client, both with a
+    connection pool sized for the concurrency limit.
+    """
+
+    def __init__(
+        self,
+        manifest: JobManifest,
+        docker_credentials: DockerCredentials,
+        profiler: Optional[Profiler] = None,
+        docker_client: Optional[DockerClient] = None,
+        cloudwatch_client: Optional[BaseClient] = None,
+    ):
+        self.manifest = manifest
+        self.docker_credentials = docker_credentials
+        self.profiler = profiler
+        self.pulled_images: Set[str] = set()
+        # every running job keeps a connection open for its log stream
+        self.docker_client = docker_client or create_docker_client(max_pool_size=manifest.concurrency * 2)
+        self.cloudwatch_client = cloudwatch_client or create_aws_logs_client(
+            manifest.aws_access_key_id,
+            manifest.aws_secret_key,
+            manifest.aws_region,
+            max_pool_connections=manifest.concurrency,
+        )
+
+    def job_arguments(self, job: ManifestJob) -> ProgramArguments:
+        return ProgramArguments(
+            docker_image=job.docker_image,
+            bash_command=job.bash_command,
+            aws_cloudwatch_group=self.manifest.aws_cloudwatch_group,
+            aws_cloudwatch_stream=job.aws_cloudwatch_stream or job.name,
+            aws_access_key_id=self.manifest.aws_access_key_id,
+            aws_secret_key=self.manifest.aws_secret_key,
+            aws_region=self.manifest.aws_region,
+        )
+
+    def prepare(self) -> None:
+        # log in, pull every image and set up the log group once, instead of once per job
+        container_service = DockerDeploymentService(
+            self.docker_credentials, client=self.docker_client, pulled_images=self.pulled_images
+        )
+        container_service.login()
+        for image_name in dict.fromkeys(job.docker_image for job in self.manifest.jobs):
+            container_service.pull_image(image_name)
+        setup_aws_log_group(self.cloudwatch_client, self.manifest.aws_cloudwatch_group)
+
+    def create_container_service(self) -> IContainerDeploymentService:
+        return DockerDeploymentService(client=self.docker_client, pulled_images=self.pulled_images)
+
+    def create_cloud_service(self, arguments: ProgramArguments, emf: bool) -> ICloudMonitoringService:
+        return AwsCloudWatchService(arguments, client=self.cloudwatch_client, emf=emf, setup_log_group=False)
+
+    def run_job(self, job: ManifestJob) -> JobResult:
+        arguments = self.job_arguments(job)
+        result = JobResult(name=job.name, aws_cloudwatch_stream=arguments.aws_cloudwatch_stream)
+        container_service = self.create_container_service()
+        metrics = None
+        if self.manifest.metrics is not None:
+            metrics = MetricExtractor(self.manifest.metrics)
+        cloud_service = self.create_cloud_service(arguments, emf=metrics is not None)
+        usecase = AwsCloudWatchUseCase(container_service, cloud_service, arguments, self.profiler, metrics)
+
+        started = time.monotonic()
+        try:
+            usecase.loop(job.docker_image, job.bash_command)
+            result.exit_code = container_service.wait_container()
+        except Exception as error:
+            logging.exception(f"job {job.name} failed")
+            result.error = str(error)
+        finally:
+            result.sent_events = usecase.sent_events
+            result.sent_bytes = usecase.sent_bytes
+            result.duration = time.monotonic() - started
+            try:
+                container_service.stop_container()
+                container_service.remove_container()
+            except Exception:
+                logging.exception(f"could not remove container of job {job.name}")
+        return result
+
+    def run(self) -> List[JobResult]:
+        self.prepare()
+        with ThreadPoolExecutor(max_workers=self.manifest.concurrency) as executor:
+            return list(executor.map(self.run_job, self.manifest.jobs))
+
+
+def format_report(results: List[JobResult]) -> str:
+    lines = [f"{'job':<30} {'stream':<30} {'exit':>5} {'events':>9} {'bytes':>12} {'seconds':>8}"]
+    for result in results:
+        exit_code = "err" if result.exit_code is None else str(result.exit_code)
+        lines.append(
+            f"{result.name:<30} {result.aws_cloudwatch_stream:<30} {exit_code:>5} "
+            f"{result.sent_events:>9} {result.sent_bytes:>12} {result.duration:>8.1f}"
+        )
+        if result.error:
+            lines.append(f"    error: {result.error}")
+    return "\n".join(lines)
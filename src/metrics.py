@@ -0,0 +1,204 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from src.validation import MetricRule, MetricsConfig
+
+# EMF accepts at most 100 distinct values per metric
+MAX_HISTOGRAM_VALUES = 100
+
+_NOT_JSON = object()
+
+
+def load_metrics_config(path: str) -> MetricsConfig:
+    with open(path) as config_file:
+        return MetricsConfig(**yaml.safe_load(config_file))
+
+
+def bucket_histogram(
+    counts: Dict[float, int], max_values: int = MAX_HISTOGRAM_VALUES
+) -> Tuple[List[float], List[int]]:
+    """Returns EMF Values and Counts, merging neighbouring values into buckets of equal weight if needed.
+
+    A bucket is represented by the mean of its values, so sums stay exact
+    and percentiles computed by CloudWatch move only within a bucket.
+    """
+    ordered = sorted(counts.items())
+    if len(ordered) <= max_values:
+        return [value for value, _ in ordered], [count for _, count in ordered]
+
+    total = sum(counts.values())
+    values: List[float] = []
+    bucket_counts: List[int] = []
+    seen = weighted_sum = bucket_count = 0
+    for value, count in ordered:
+        seen += count
+        weighted_sum += value * count
+        bucket_count += count
+        # close the k-th bucket once k / max_values of all observations are in
+        if seen * max_values >= (len(values) + 1) * total:
+            values.append(weighted_sum / bucket_count)
+            bucket_counts.append(bucket_count)
+            weighted_sum = bucket_count = 0
+    return values, bucket_counts
+
+
+class MetricRuleMatcher:
+    """Extracts the observed value of one rule from a raw log line."""
+
+    def __init__(self, rule: MetricRule):
+        self.rule = rule
+        self.pattern: Optional[re.Pattern] = None
+        self.value_group: Optional[Any] = None
+        self.field_path: List[str] = []
+
+        if rule.pattern is not None:
+            self.pattern = re.compile(rule.pattern.encode("utf-8"))
+            if "value" in self.pattern.groupindex:
+                self.value_group = "value"
+            elif self.pattern.groups:
+                self.value_group = 1
+        else:
+            self.field_path = rule.json_field.split(".")
+
+    def match(self, message: bytes, document: Any) -> Optional[float]:
+        """Returns the observed value, 1.0 for a matched counter, None if the line does not match."""
+        if self.pattern is not None:
+            found = self.pattern.search(message)
+            if found is None:
+                return None
+            if self.rule.type == "counter":
+                return 1.0
+            try:
+                value = float(found.group(self.value_group))
+            except (TypeError, ValueError):
+                return None
+            # NaN and Infinity would make the whole EMF event invalid JSON
+            return value if math.isfinite(value) else None
+
+        if document is _NOT_JSON:
+            return None
+        value = document
+        for key in self.field_path:
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        if self.rule.type == "counter":
+            return 1.0
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+        return float(value)
+
+
+class MetricExtractor:
+    """Aggregates metrics from raw log lines into one CloudWatch EMF event per interval.
+
+    Counters count matching lines, histograms count the observed values of
+    the interval and are shipped as EMF Values/Counts, so CloudWatch
+    computes percentiles which stay correct across intervals and jobs.
+    Lines matched by any rule can be kept, dropped or sampled, so thousands
+    of raw events become a single aggregate.
+    """
+
+    def __init__(self, config: MetricsConfig, clock: Callable[[], float] = time.time):
+        self.config = config
+        self.clock = clock
+        self.matchers = [MetricRuleMatcher(rule) for rule in config.metrics]
+        self.needs_json = any(rule.json_field is not None for rule in config.metrics)
+        self._lock = threading.Lock()
+        self._interval_start = clock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._observations = 0
+        self._counters: Dict[str, float] = {
+            rule.name: 0.0 for rule in self.config.metrics if rule.type == "counter"
+        }
+        self._histograms: Dict[str, Counter] = {
+            rule.name: Counter() for rule in self.config.metrics if rule.type == "histogram"
+        }
+
+    def _parse_json(self, message: bytes) -> Any:
+        if not self.needs_json or not message.lstrip().startswith(b"{"):
+            return _NOT_JSON
+        try:
+            return json.loads(message)
+        except ValueError:
+            return _NOT_JSON
+
+    def process(self, message: bytes) -> bool:
+        """Aggregates one raw line, returns whether the line itself should still be shipped."""
+        document = self._parse_json(message)
+        matched = False
+        with self._lock:
+            for matcher in self.matchers:
+                value = matcher.match(message, document)
+                if value is None:
+                    continue
+                matched = True
+                self._observations += 1
+                if matcher.rule.type == "counter":
+                    self._counters[matcher.rule.name] += value
+                else:
+                    self._histograms[matcher.rule.name][value] += 1
+
+        if not matched or self.config.matched_lines == "keep":
+            return True
+        if self.config.matched_lines == "sample":
+            return random.random() < self.config.sample_rate
+        return False
+
+    def flush_due(self) -> Optional[bytes]:
+        """Returns the EMF event of the current interval once it has elapsed."""
+        return self._close_interval(due_only=True)
+
+    def flush(self) -> Optional[bytes]:
+        """Closes the current interval, returns its EMF event or None if nothing was observed."""
+        return self._close_interval(due_only=False)
+
+    def _close_interval(self, due_only: bool) -> Optional[bytes]:
+        with self._lock:
+            now = self.clock()
+            if due_only and now - self._interval_start < self.config.interval:
+                return None
+            observations, counters, histograms = self._observations, self._counters, self._histograms
+            self._interval_start = now
+            self._reset()
+        if not observations:
+            return None
+        return self.to_emf(now, counters, histograms)
+
+    def to_emf(self, timestamp: float, counters: Dict[str, float], histograms: Dict[str, Counter]) -> bytes:
+        units = {rule.name: rule.unit for rule in self.config.metrics}
+        definitions = []
+        event: Dict[str, Any] = dict(self.config.dimensions)
+
+        for name, value in counters.items():
+            definitions.append({"Name": name, "Unit": units[name] or "Count"})
+            event[name] = value
+
+        for name, counts in histograms.items():
+            if not counts:
+                continue
+            values, value_counts = bucket_histogram(counts)
+            definitions.append({"Name": name, "Unit": units[name] or "None"})
+            event[name] = {"Values": values, "Counts": value_counts}
+
+        event["_aws"] = {
+            "Timestamp": int(timestamp * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": self.config.namespace,
+                    "Dimensions": [list(self.config.dimensions)],
+                    "Metrics": definitions,
+                }
+            ],
+        }
+        return json.dumps(event, separators=(",", ":")).encode("utf-8")
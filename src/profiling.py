@@ -0,0 +1,246 @@
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_NO_STAGE = contextlib.nullcontext()
+_END = object()
+
+# without per-thread cpu time threads blocked in these frames are left out of wall-clock samples
+WAIT_FRAMES = frozenset(("wait", "_wait_for_tstate_lock", "join", "select", "poll"))
+
+
+def thread_cpu_time_ns(native_id: int) -> Optional[int]:
+    """Returns cpu time used by a thread of this process, None where the kernel does not tell."""
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat") as schedstat:
+            return int(schedstat.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+
+class SlowCallbackHandler(logging.Handler):
+    """Collects the "Executing <handle> took N seconds" warnings of asyncio debug mode."""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.callbacks: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if str(record.msg).startswith("Executing"):
+            self.callbacks.append(record.getMessage())
+
+
+class Profiler:
+    """Low-overhead profiling of the logs shipping hot path.
+
+    A background thread samples the stacks of all other threads, weighting
+    every sample by the cpu time the thread used since the previous one
+    (microseconds; plain wall-clock samples without idle threads where
+    per-thread cpu time is unavailable). Another thread takes tracemalloc
+    snapshots and writes them to output_dir as they are taken. Stages of
+    the use cases are timed with stage() and timed_iter(), instrumented
+    event loops report slow callbacks. stop() adds collapsed stacks (for
+    flamegraph.pl or speedscope) and a summary.
+    When disabled every hook is a no-op.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "ccru-profile",
+        enabled: bool = True,
+        sample_interval: float = 0.01,
+        snapshot_interval: float = 10.0,
+        slow_callback_duration: float = 0.1,
+    ):
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self.snapshot_interval = snapshot_interval
+        self.slow_callback_duration = slow_callback_duration
+
+        self.stages: Dict[str, StageStats] = {}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.cpu_sampling = thread_cpu_time_ns(threading.get_native_id()) is not None
+        self._thread_cpu: Dict[int, int] = {}
+        # snapshots go to disk when taken, only these two are kept for the growth comparison
+        self.snapshot_count = 0
+        self.first_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.slow_callbacks = SlowCallbackHandler()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started_at = 0.0
+
+    @contextlib.contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats()
+                stats.add(duration)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NO_STAGE
+        return self._timed(name)
+
+    def timed_iter(self, name: str, iterable: Iterable[T]) -> Iterable[T]:
+        """Times every step of iterable, i.e. the wait for the next item."""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        iterator = iter(iterable)
+        while True:
+            with self._timed(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def instrument_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        if not self.enabled:
+            return
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.slow_callback_duration
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        logging.getLogger("asyncio").addHandler(self.slow_callbacks)
+        tracemalloc.start()
+        self._started_at = time.monotonic()
+        for target, name in ((self._sampling_loop, "ccru-sampler"), (self._snapshot_loop, "ccru-tracemalloc")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _sample_weight(self, thread: Optional[threading.Thread], frame) -> int:
+        if not self.cpu_sampling:
+            return 0 if frame.f_code.co_name in WAIT_FRAMES else 1
+        if thread is None or thread.native_id is None:
+            return 0
+        cpu_time = thread_cpu_time_ns(thread.native_id)
+        if cpu_time is None:
+            return 0
+        previous = self._thread_cpu.get(thread.ident, cpu_time)
+        self._thread_cpu[thread.ident] = cpu_time
+        return (cpu_time - previous) // 1000
+
+    def _sampling_loop(self) -> None:
+        while not self._stopped.wait(self.sample_interval):
+            own_threads = {thread.ident for thread in self._threads}
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident in own_threads:
+                    continue
+                thread = threads.get(ident)
+                weight = self._sample_weight(thread, frame)
+                if weight <= 0:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread.name if thread is not None else str(ident))
+                self.stacks[";".join(reversed(stack))] += weight
+            self.samples += 1
+
+    def _take_snapshot(self) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(os.path.join(self.output_dir, f"tracemalloc-{self.snapshot_count}.snapshot"))
+        self.snapshot_count += 1
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        else:
+            self.last_snapshot = snapshot
+
+    def _snapshot_loop(self) -> None:
+        while not self._stopped.wait(self.snapshot_interval):
+            self._take_snapshot()
+
+    def stop(self) -> None:
+        if not self.enabled or self._stopped.is_set():
+            return
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        logging.getLogger("asyncio").removeHandler(self.slow_callbacks)
+
+        with open(os.path.join(self.output_dir, "stacks.collapsed"), "w") as stacks_file:
+            for stack, count in self.stacks.items():
+                stacks_file.write(f"{stack} {count}\n")
+        summary = self.summary(current, peak)
+        with open(os.path.join(self.output_dir, "summary.txt"), "w") as summary_file:
+            summary_file.write(summary)
+        logging.info(f"profile written to {self.output_dir}\n{summary}")
+
+    def summary(self, current_memory: int, peak_memory: int) -> str:
+        elapsed = time.monotonic() - self._started_at
+        sampling = "cpu time weighted" if self.cpu_sampling else "wall-clock, waiting threads left out"
+        lines = [f"profiled {elapsed:.1f}s, {self.samples} stack samples ({sampling})", "", "stages:"]
+        lines.append(f"  {'stage':<24} {'count':>9} {'total s':>9} {'mean ms':>9} {'max ms':>9}")
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].total):
+            mean = stats.total / stats.count * 1000 if stats.count else 0.0
+            lines.append(
+                f"  {name:<24} {stats.count:>9} {stats.total:>9.3f} {mean:>9.3f} {stats.max * 1000:>9.3f}"
+            )
+
+        own_time: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own_time[stack.rsplit(";", 1)[-1]] += count
+        if self.cpu_sampling:
+            lines += ["", "top frames by cpu time (ms):"]
+            lines += [f"  {count / 1000:>9.1f} {frame}" for frame, count in own_time.most_common(15)]
+        else:
+            lines += ["", "top frames by wall-clock samples:"]
+            lines += [f"  {count:>9} {frame}" for frame, count in own_time.most_common(15)]
+
+        lines += ["", f"slow event loop callbacks (> {self.slow_callback_duration}s): "
+                      f"{len(self.slow_callbacks.callbacks)}"]
+        lines += [f"  {message}" for message in self.slow_callbacks.callbacks[:10]]
+
+        lines += ["", f"traced memory: current {current_memory / 2 ** 20:.1f} MiB, "
+                      f"peak {peak_memory / 2 ** 20:.1f} MiB"]
+        if self.last_snapshot is not None:
+            lines.append("largest growth since the first snapshot:")
+            for stat in self.last_snapshot.compare_to(self.first_snapshot, "lineno")[:10]:
+                lines.append(f"  {stat}")
+        return "\n".join(lines) + "\n"
@@ -2,17 +2,19 @@ import asyncio
 import datetime
 import logging
 from abc import ABC, abstractmethod
-from typing import Generator, List, Optional
+from typing import Generator, List, Optional, Set, Union
 
 import aioboto3
 import boto3
 import docker
 from botocore.client import BaseClient
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from docker import DockerClient
 from docker.models.containers import Container
 
 from src.erorrs import CloudClientQueryError, CloudServerQueryError
+from src.events import LogEventBatch
 from src.validation import DockerCredentials, ProgramArguments
 
 
@@ -42,6 +44,10 @@ class IContainerDeploymentService(ABC):
     def get_logs(self) -> Generator[bytes, None, None]:
         pass
 
+    @abstractmethod
+    def wait_container(self) -> int:
+        pass
+
     @abstractmethod
     def stop_container(self):
         pass
@@ -55,8 +61,17 @@ class IContainerDeploymentService(ABC):
         pass
 
 
+def create_docker_client(max_pool_size: int = 10) -> DockerClient:
+    return docker.from_env(max_pool_size=max_pool_size)
+
+
 class DockerDeploymentService(IContainerDeploymentService):
-    def __init__(self, credentials: Optional[DockerCredentials] = None):
+    def __init__(
+        self,
+        credentials: Optional[DockerCredentials] = None,
+        client: Optional[DockerClient] = None,
+        pulled_images: Optional[Set[str]] = None,
+    ):
         if credentials is None:
             self.docker_username = ""
             self.docker_password = ""
@@ -64,7 +79,9 @@ class DockerDeploymentService(IContainerDeploymentService):
             self.docker_username = credentials.username
             self.docker_password = credentials.password
 
-        self.client: Optional[DockerClient] = None
+        self.client: Optional[DockerClient] = client
+        # images known to be present already, shared by services which share a client
+        self.pulled_images: Set[str] = set() if pulled_images is None else pulled_images
         self.container: Optional[Container] = None
         self.image_name: Optional[str] = None
         self.time_started: Optional[datetime] = None
@@ -79,7 +96,8 @@ class DockerDeploymentService(IContainerDeploymentService):
         return container_state["Status"] == "running"
 
     def login(self):
-        self.client = docker.from_env()
+        if self.client is None:
+            self.client = docker.from_env()
         if self.docker_username and self.docker_password:
             self.client.login(username=self.docker_username, password=self.docker_password)
 
@@ -90,11 +108,15 @@ class DockerDeploymentService(IContainerDeploymentService):
         return str(self.container.exec_run(command))
 
     def pull_image(self, image_name: str) -> None:
+        if image_name in self.pulled_images:
+            self.image_name = image_name
+            return
         if image_name not in [image.tags[0] for image in self.client.images.list() if len(image.tags) > 0]:
             logging.info(f"pulling {image_name}")
             self.client.images.pull(image_name)
         else:
             logging.info(f"{image_name} already exists")
+        self.pulled_images.add(image_name)
         self.image_name = image_name
 
     def run_container(self, command: Optional[str] = None) -> None:
@@ -108,6 +130,11 @@ class DockerDeploymentService(IContainerDeploymentService):
         logs = self.container.logs(stream=True)
         return logs
 
+    def wait_container(self) -> int:
+        if not self.container:
+            raise ValueError("Container was not created yet")
+        return self.container.wait()["StatusCode"]
+
     def stop_container(self):
         if self.container is not None and self.container_is_running():
             self.container.stop()
@@ -120,7 +147,7 @@ class DockerDeploymentService(IContainerDeploymentService):
 class ICloudMonitoringService(ABC):
 
     @abstractmethod
-    def send_logs(self, logs: List[str]) -> bool:
+    def send_logs(self, logs: Union[List[str], LogEventBatch]) -> bool:
         pass
 
     # arguments really depend on concrete cloud provider
@@ -132,7 +159,7 @@ class ICloudMonitoringService(ABC):
 class IAsyncCloudMonitoringService(ABC):
 
     @abstractmethod
-    async def send_logs(self, logs: List[str]) -> bool:
+    async def send_logs(self, logs: Union[List[str], LogEventBatch]) -> bool:
         pass
 
     # arguments really depend on concrete cloud provider
@@ -141,35 +168,79 @@ class IAsyncCloudMonitoringService(ABC):
         pass
 
 
+def create_aws_logs_client(
+    aws_access_key_id: str,
+    aws_secret_key: str,
+    aws_region: str,
+    max_pool_connections: int = 10,
+) -> BaseClient:
+    return boto3.client(
+        "logs",
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_key,
+        region_name=aws_region,
+        config=Config(max_pool_connections=max_pool_connections),
+    )
+
+
+def add_emf_header(request, **kwargs):
+    request.headers["x-amzn-logs-format"] = "json/emf"
+
+
+# PutLogEvents extracts metrics from embedded metric format events only when asked with this header
+def register_emf_header(client: BaseClient) -> None:
+    client.meta.events.register(
+        "before-sign.cloudwatch-logs.PutLogEvents", add_emf_header, unique_id="ccru-emf-header"
+    )
+
+
+def setup_aws_log_group(client: BaseClient, cloudwatch_group: str) -> None:
+    # create directly, several services may share one group and create it meanwhile
+    try:
+        client.create_log_group(logGroupName=cloudwatch_group)
+    except client.exceptions.ResourceAlreadyExistsException:
+        pass
+    client.put_retention_policy(logGroupName=cloudwatch_group, retentionInDays=3)
+
+
 class AwsCloudWatchService(ICloudMonitoringService):
-    def __init__(self, arguments: ProgramArguments):
+    def __init__(
+        self,
+        arguments: ProgramArguments,
+        client: Optional[BaseClient] = None,
+        emf: bool = False,
+        setup_log_group: bool = True,
+    ):
         self.aws_access_key_id = arguments.aws_access_key_id
         self.aws_secret_key = arguments.aws_secret_key
         self.aws_region = arguments.aws_region
         self.cloudwatch_group = arguments.aws_cloudwatch_group
         self.cloudwatch_stream = arguments.aws_cloudwatch_stream
-        self.client: Optional[BaseClient] = None
+        self.client: Optional[BaseClient] = client
+        self.emf = emf
+        # False when the group was already set up by whoever shares the client
+        self.setup_log_group = setup_log_group
+        self.logged_in = False
 
     def login(self):
-        self.client: BaseClient = boto3.client(
-            "logs",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_key,
-            region_name=self.aws_region
-        )
+        # the client and the stream are reused by every call, so only set them up once
+        if self.logged_in:
+            return
 
-        if not self.client.describe_log_groups(logGroupNamePrefix=self.cloudwatch_group)["logGroups"]:
-            self.client.create_log_group(logGroupName=self.cloudwatch_group)
+        if self.client is None:
+            self.client = create_aws_logs_client(self.aws_access_key_id, self.aws_secret_key, self.aws_region)
+        if self.emf:
+            register_emf_header(self.client)
 
-        if not self.client.describe_log_streams(
-                logGroupName=self.cloudwatch_group,
-                logStreamNamePrefix=self.cloudwatch_stream)["logStreams"]:
-            self.client.create_log_stream(logGroupName=self.cloudwatch_group, logStreamName=self.cloudwatch_stream)
+        if self.setup_log_group:
+            setup_aws_log_group(self.client, self.cloudwatch_group)
 
-        self.client.put_retention_policy(
-            logGroupName=self.cloudwatch_group,
-            retentionInDays=3
-        )
+        # a prefix lookup would find "lint-docs" for "lint", so create the exact stream
+        try:
+            self.client.create_log_stream(logGroupName=self.cloudwatch_group, logStreamName=self.cloudwatch_stream)
+        except self.client.exceptions.ResourceAlreadyExistsException:
+            pass
+        self.logged_in = True
 
     def get_logs(self, start_time: int, end_time: int, max_logs: Optional[int] = 100) -> str:
         self.login()
@@ -201,11 +272,13 @@ class AwsCloudWatchService(ICloudMonitoringService):
             ]:
                 return results.get("results", [])
 
-    def send_logs(self, logs: List[str]) -> bool:
+    def send_logs(self, logs: Union[List[str], LogEventBatch]) -> bool:
         self.login()
         if len(logs) == 0:
             return False
-        log_events = [{"timestamp": int(datetime.datetime.now().timestamp() * 1000), "message": log} for log in logs]
+        if not isinstance(logs, LogEventBatch):
+            logs = LogEventBatch.from_messages(logs)
+        log_events = logs.to_cloudwatch_events()
         response = self.client.put_log_events(
             logGroupName=self.cloudwatch_group,
             logStreamName=self.cloudwatch_stream,
@@ -215,7 +288,7 @@ class AwsCloudWatchService(ICloudMonitoringService):
 
 
 class AsyncAwsCloudWatchService(IAsyncCloudMonitoringService):
-    def __init__(self, arguments: ProgramArguments):
+    def __init__(self, arguments: ProgramArguments, emf: bool = False):
         self.aws_access_key_id = arguments.aws_access_key_id
         self.aws_secret_key = arguments.aws_secret_key
         self.aws_region = arguments.aws_region
@@ -223,6 +296,7 @@ class AsyncAwsCloudWatchService(IAsyncCloudMonitoringService):
         self.cloudwatch_stream = arguments.aws_cloudwatch_stream
         self.client: Optional[BaseClient] = None
         self.session: Optional[aioboto3.Session] = None
+        self.emf = emf
 
     async def login(self):
         self.session = aioboto3.Session()
@@ -279,7 +353,11 @@ class AsyncAwsCloudWatchService(IAsyncCloudMonitoringService):
                 except ClientError:
                     await asyncio.sleep(0.5)
 
-    async def send_logs(self, logs: List[str]) -> bool:
+    async def send_logs(self, logs: Union[List[str], LogEventBatch]) -> bool:
+        if len(logs) == 0:
+            return False
+        if not isinstance(logs, LogEventBatch):
+            logs = LogEventBatch.from_messages(logs)
         await self.login()
         async with self.session.client(
             "logs",
@@ -287,6 +365,8 @@ class AsyncAwsCloudWatchService(IAsyncCloudMonitoringService):
             aws_secret_access_key=self.aws_secret_key,
             region_name=self.aws_region
         ) as client:
+            if self.emf:
+                register_emf_header(client)
             response = await client.describe_log_streams(
                 logGroupName=self.cloudwatch_group,
                 logStreamNamePrefix=self.cloudwatch_stream,
@@ -296,7 +376,7 @@ class AsyncAwsCloudWatchService(IAsyncCloudMonitoringService):
                 response["logStreams"][0].get("uploadSequenceToken") if response["logStreams"] else None
             )
 
-            logs_with_datestamp = [{"message": log, "timestamp": int(datetime.datetime.now().timestamp() * 1000)} for log in logs]
+            logs_with_datestamp = logs.to_cloudwatch_events()
 
             # start_time = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)).timestamp()
             response = await client.put_log_events(
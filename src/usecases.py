@@ -1,10 +1,13 @@
 import asyncio
 import logging
-import queue
 import threading
 from abc import ABC, abstractmethod
-from typing import Generator, List, Optional
+from typing import Generator, List, Optional, Set, Union
 
+from src.erorrs import CloudLogsSendError
+from src.events import LogEventBatch, LogEventQueue
+from src.metrics import MetricExtractor
+from src.profiling import Profiler
 from src.services import (
     IAsyncCloudMonitoringService,
     ICloudMonitoringService,
@@ -23,7 +26,7 @@ class ILogsMonitoringUseCase(ABC):
         pass
 
     @abstractmethod
-    def send_logs_to_cloud(self, logs: List[str]) -> None:
+    def send_logs_to_cloud(self, logs: Union[List[str], LogEventBatch]) -> None:
         pass
 
     @abstractmethod
@@ -31,17 +34,47 @@ class ILogsMonitoringUseCase(ABC):
         pass
 
 
-class AwsCloudWatchUseCase(ILogsMonitoringUseCase):
+class MetricsQueueMixin:
+    """Queues container lines for sending, aggregating them into metrics first if configured."""
+
+    metrics: Optional[MetricExtractor]
+    queue: LogEventQueue
+
+    def queue_log(self, log: bytes) -> None:
+        if self.metrics is not None:
+            keep = self.metrics.process(log)
+            self.flush_metrics()
+            if not keep:
+                return
+        self.queue.put(log)
+
+    def flush_metrics(self, force: bool = False) -> None:
+        if self.metrics is None:
+            return
+        event = self.metrics.flush() if force else self.metrics.flush_due()
+        if event is not None:
+            self.queue.put(event)
+
+
+class AwsCloudWatchUseCase(MetricsQueueMixin, ILogsMonitoringUseCase):
     def __init__(
         self,
         container_service: IContainerDeploymentService,
         cloud_service: ICloudMonitoringService,
         arguments: Optional[ProgramArguments] = None,
+        profiler: Optional[Profiler] = None,
+        metrics: Optional[MetricExtractor] = None,
     ):
         self.cloud_service = cloud_service
         self.container_service = container_service
         self.arguments = arguments
-        self.queue = queue.Queue()
+        self.profiler = profiler or Profiler(enabled=False)
+        self.metrics = metrics
+        self.queue = LogEventQueue()
+        self.logs_streamed = False
+        self.sending_error: Optional[Exception] = None
+        self.sent_events = 0
+        self.sent_bytes = 0
 
     def get_logs_from_container(self) -> Generator[bytes, None, None]:
         return self.container_service.get_logs()
@@ -52,24 +85,37 @@ class AwsCloudWatchUseCase(ILogsMonitoringUseCase):
     def run_bash_command_on_container(self, bash_command: str) -> str:
         return self.container_service.run_bash_command(bash_command)
 
-    def send_logs_to_cloud(self, logs: List[str]) -> None:
+    def send_logs_to_cloud(self, logs: Union[List[str], LogEventBatch]) -> None:
         self.cloud_service.send_logs(logs)
 
+    def send_batch(self, log_batch: LogEventBatch) -> None:
+        with self.profiler.stage("send_logs"):
+            success = self.cloud_service.send_logs(log_batch)
+        if not success:
+            raise CloudLogsSendError("Failed to send logs to cloudwatch")
+        self.sent_events += len(log_batch)
+        self.sent_bytes += log_batch.payload_size
+
     def logging_loop(self):
         while self.container_service.container_is_running():
+            self.logs_streamed = True
             logs_generator = self.get_logs_from_container()
-            for log in logs_generator:
-                self.queue.put(log.decode("utf-8"))
+            for log in self.profiler.timed_iter("logging_loop.read", logs_generator):
+                with self.profiler.stage("logging_loop.put"):
+                    self.queue_log(log)
 
     def sending_loop(self):
-        while not self.queue.empty() or self.container_service.container_is_running():
-            log_batch = []
-            while not self.queue.empty() or len(log_batch) < 15:
-                log_batch.append(self.queue.get())
-            if len(log_batch) > 0:
-                success = self.cloud_service.send_logs(log_batch)
-                if not success:
-                    raise Exception("Failed to send logs to cloudwatch")
+        # an exception would end up in threading.excepthook only, loop() re-raises it after join
+        try:
+            while not self.queue.empty() or self.container_service.container_is_running():
+                self.flush_metrics()
+                with self.profiler.stage("batcher"):
+                    log_batch = self.queue.get_batch(timeout=1)
+                if len(log_batch) > 0:
+                    self.send_batch(log_batch)
+        except Exception as error:
+            logging.exception("sending logs failed")
+            self.sending_error = error
 
     def loop(self, image_name: str, bash_command: str) -> None:
         self.container_service.login()
@@ -84,28 +130,60 @@ class AwsCloudWatchUseCase(ILogsMonitoringUseCase):
 
         logging_thread.join()
         sending_thread.join()
+        if self.sending_error is not None:
+            raise self.sending_error
 
-        post_mortem_logs = self.get_logs_from_container()
-        logs = [log.decode("utf-8") for log in post_mortem_logs]
-        self.cloud_service.send_logs(logs)
+        # logs streamed while the container was running are already queued,
+        # only a container which exited before streaming started needs a resend
+        if not self.logs_streamed:
+            for log in self.get_logs_from_container():
+                self.queue_log(log)
+        self.flush_metrics(force=True)
+        # the sender may stop before the logging thread queued the last lines
+        while not self.queue.empty():
+            self.send_batch(self.queue.get_batch())
 
 
-class AsyncAwsLogsUseCase(ILogsMonitoringUseCase):
+class AsyncAwsLogsUseCase(MetricsQueueMixin, ILogsMonitoringUseCase):
     def __init__(
         self,
         container_service: IContainerDeploymentService,
         cloud_service: IAsyncCloudMonitoringService,
         arguments: Optional[ProgramArguments] = None,
+        profiler: Optional[Profiler] = None,
+        metrics: Optional[MetricExtractor] = None,
     ):
         self.cloud_service = cloud_service
         self.container_service = container_service
         self.arguments = arguments
-        self.queue = queue.Queue()
+        self.profiler = profiler or Profiler(enabled=False)
+        self.metrics = metrics
+        self.queue = LogEventQueue()
+        self.logging_done = threading.Event()
+        self.sending_error: Optional[Exception] = None
+        self.sending_tasks: Set[asyncio.Task] = set()
         self.semafore = asyncio.Semaphore(29)
 
-    async def send_logs_to_cloud(self, logs: List[str]) -> None:
+    async def send_logs_to_cloud(self, logs: Union[List[str], LogEventBatch]) -> None:
         async with self.semafore:
-            await self.cloud_service.send_logs(logs)
+            with self.profiler.stage("send_logs"):
+                success = await self.cloud_service.send_logs(logs)
+        if not success:
+            raise CloudLogsSendError("Failed to send logs to cloudwatch")
+
+    def start_sending(self, log_batch: LogEventBatch) -> None:
+        task = asyncio.create_task(self.send_logs_to_cloud(log_batch))
+        self.sending_tasks.add(task)
+        task.add_done_callback(self.sending_done)
+
+    def sending_done(self, task: asyncio.Task) -> None:
+        # retrieving the exception here keeps it from getting lost with the task
+        self.sending_tasks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        logging.error("sending logs failed", exc_info=task.exception())
+        if self.sending_error is None:
+            self.sending_error = task.exception()
 
     async def run_bash_command_on_container(self, bash_command: str) -> str:
         return self.container_service.run_bash_command(bash_command)
@@ -114,25 +192,42 @@ class AsyncAwsLogsUseCase(ILogsMonitoringUseCase):
         return self.container_service.get_logs()
 
     def logging_loop(self):
-        while self.container_service.container_is_running():
-            logs_generator = self.container_service.get_logs()
-            for log in logs_generator:
-                if log is not None:
-                    self.queue.put(log.decode("utf-8"))
+        try:
+            while self.container_service.container_is_running():
+                logs_generator = self.container_service.get_logs()
+                for log in self.profiler.timed_iter("logging_loop.read", logs_generator):
+                    if log is not None:
+                        with self.profiler.stage("logging_loop.put"):
+                            self.queue_log(log)
+        finally:
+            self.logging_done.set()
 
     async def sending_loop(self):
-        while not self.queue.empty() or self.container_service.container_is_running():
-            # noinspection PyAsyncCall
+        # the stream may still yield the last lines after the container stopped
+        while self.sending_error is None and (not self.queue.empty() or not self.logging_done.is_set()):
+            self.flush_metrics()
             if not self.queue.empty():
-                log = self.queue.get()
-                if log is not None:
-                    asyncio.create_task(self.send_logs_to_cloud([log]))
-                    await asyncio.sleep(0.1)
+                with self.profiler.stage("batcher"):
+                    log_batch = self.queue.get_batch()
+                self.start_sending(log_batch)
+            await asyncio.sleep(0.1)
+        if self.sending_error is None:
+            self.flush_metrics(force=True)
+            while not self.queue.empty():
+                self.start_sending(self.queue.get_batch())
+        await asyncio.gather(*self.sending_tasks, return_exceptions=True)
 
     def create_event_loop(self, loop):
+        # an exception would end up in threading.excepthook only, loop() re-raises it after join
         asyncio.set_event_loop(loop)
-        asyncio.run_coroutine_threadsafe(self.sending_loop(), loop)
-        loop.run_forever()
+        self.profiler.instrument_loop(loop)
+        try:
+            loop.run_until_complete(self.sending_loop())
+        except Exception as error:
+            logging.exception("sending logs failed")
+            self.sending_error = error
+        finally:
+            loop.close()
 
     async def loop(self, image_name: str, bash_command: str):
         self.container_service.login()
@@ -148,3 +243,5 @@ class AsyncAwsLogsUseCase(ILogsMonitoringUseCase):
         sending_thread.start()
         logging_thread.join()
         sending_thread.join()
+        if self.sending_error is not None:
+            raise self.sending_error
@@ -1,6 +1,7 @@
-from typing import Optional
+import re
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 
 class ProgramArguments(BaseModel):
@@ -16,3 +17,85 @@ class ProgramArguments(BaseModel):
 class DockerCredentials(BaseModel):
     username: Optional[str] = None
     password: Optional[str] = None
+
+
+class MetricRule(BaseModel):
+    name: str
+    type: Literal["counter", "histogram"] = "counter"
+    # a regex matched against raw lines, a named group "value" (or the first group) is the observed value
+    pattern: Optional[str] = None
+    # a dotted path into lines which are JSON objects
+    json_field: Optional[str] = None
+    unit: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_source(self) -> "MetricRule":
+        if (self.pattern is None) == (self.json_field is None):
+            raise ValueError(f"metric {self.name} needs either pattern or json_field")
+        if self.pattern is not None:
+            try:
+                # compiled like the extractor does, lines are matched as raw bytes
+                pattern = re.compile(self.pattern.encode("utf-8"))
+            except re.error as error:
+                raise ValueError(f"metric {self.name} pattern is not a valid regex: {error}")
+            if self.type == "histogram" and not pattern.groups:
+                raise ValueError(f"histogram {self.name} pattern has no group to take a value from")
+        return self
+
+
+class MetricsConfig(BaseModel):
+    namespace: str = "CCRU"
+    interval: float = Field(default=60.0, gt=0)
+    dimensions: Dict[str, str] = {}
+    # what happens to raw lines matched by at least one metric
+    matched_lines: Literal["keep", "drop", "sample"] = "keep"
+    sample_rate: float = Field(default=0.01, ge=0, le=1)
+    metrics: List[MetricRule]
+
+    @model_validator(mode="after")
+    def check_names(self) -> "MetricsConfig":
+        # metrics and dimensions share the root of every EMF event
+        taken = {"_aws", *self.dimensions}
+        for rule in self.metrics:
+            if rule.name in taken:
+                raise ValueError(f"metric name {rule.name} is used twice or clashes with a dimension")
+            taken.add(rule.name)
+        return self
+
+
+class ManifestJob(BaseModel):
+    name: str
+    docker_image: str
+    bash_command: str
+    aws_cloudwatch_stream: Optional[str] = None
+
+
+class JobManifest(BaseModel):
+    aws_cloudwatch_group: str
+    aws_access_key_id: Optional[str] = None
+    aws_secret_key: Optional[str] = None
+    aws_region: Optional[str] = None
+    concurrency: int = Field(default=4, ge=1)
+    metrics: Optional[MetricsConfig] = None
+    jobs: List[ManifestJob]
+
+    @model_validator(mode="after")
+    def check_streams(self) -> "JobManifest":
+        # every job writes to its own stream, named after the job unless given
+        streams = set()
+        for job in self.jobs:
+            stream = job.aws_cloudwatch_stream or job.name
+            if stream in streams:
+                raise ValueError(f"job {job.name} uses stream {stream} of another job")
+            streams.add(stream)
+        return self
+
+
+class JobResult(BaseModel):
+    name: str
+    aws_cloudwatch_stream: str
+    exit_code: Optional[int] = None
+    sent_events: int = 0
+    sent_bytes: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
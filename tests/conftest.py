@@ -1,6 +1,5 @@
 import os
-from datetime import datetime
-from typing import Optional
+from typing import Generator, Optional
 
 import pytest
 
@@ -61,9 +60,13 @@ def mock_cloudwatch_service():
             self.aws_region = arguments.aws_region
             self.cloudwatch_group = arguments.aws_cloudwatch_group
             self.cloudwatch_stream = arguments.aws_cloudwatch_stream
+            self.success = True
+            self.sent = []
 
-        def send_logs(self, logs: str) -> None:
-            pass
+        def send_logs(self, logs) -> bool:
+            if self.success:
+                self.sent.append(logs)
+            return self.success
 
     return MockCloudWatchService
 
@@ -80,12 +83,21 @@ def mock_container_service():
         def stop_container(self):
             pass
 
+        def wait_container(self) -> int:
+            return self.exit_code
+
+        # runs until its logs were read, unless it exited before anyone looked
         def container_is_running(self) -> bool:
-            pass
+            return self.started_running and not self.logs_read
 
-        def __init__(self, credentials: Optional[DockerCredentials]):
+        def __init__(self, credentials: Optional[DockerCredentials] = None):
+            credentials = credentials or DockerCredentials()
             self.docker_username = credentials.username or ""
             self.docker_password = credentials.password or ""
+            self.logs = [b"hello\n"]
+            self.logs_read = False
+            self.started_running = True
+            self.exit_code = 0
 
         def pull_image(self, image_name: str) -> None:
             pass
@@ -96,7 +108,8 @@ def mock_container_service():
         def run_bash_command(self, command: str) -> str:
             return "hello"
 
-        def get_logs(self, since: datetime) -> str:
-            return "hello"
+        def get_logs(self) -> Generator[bytes, None, None]:
+            self.logs_read = True
+            return iter(self.logs)
 
     return MockContainerService
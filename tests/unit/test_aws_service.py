@@ -0,0 +1,40 @@
+import pytest
+from botocore.stub import Stubber
+
+from src.services import AwsCloudWatchService, create_aws_logs_client
+from src.validation import ProgramArguments
+
+
+class Request:
+    def __init__(self):
+        self.headers = {}
+
+
+@pytest.fixture
+def program_arguments():
+    return ProgramArguments(
+        docker_image="test-image",
+        bash_command="echo hello",
+        aws_cloudwatch_group="test-group",
+        aws_cloudwatch_stream="test-stream",
+        aws_access_key_id="test-access-key",
+        aws_secret_key="test-secret-key",
+        aws_region="us-west-2",
+    )
+
+
+@pytest.mark.parametrize("emf, header", [(True, "json/emf"), (False, None)])
+def test_emf_header_is_added_to_put_log_events(program_arguments, emf, header):
+    client = create_aws_logs_client("test-access-key", "test-secret-key", "us-west-2")
+    service = AwsCloudWatchService(program_arguments, client=client, emf=emf, setup_log_group=False)
+    with Stubber(client) as stubber:
+        stubber.add_response("create_log_stream", {})
+        service.login()
+
+    request = Request()
+    client.meta.events.emit("before-sign.cloudwatch-logs.PutLogEvents", request=request)
+    assert request.headers.get("x-amzn-logs-format") == header
+
+    request = Request()
+    client.meta.events.emit("before-sign.cloudwatch-logs.DescribeLogStreams", request=request)
+    assert "x-amzn-logs-format" not in request.headers
@@ -0,0 +1,68 @@
+from src import events
+from src.events import EVENT_OVERHEAD_BYTES, LogEventBatch, LogEventQueue
+
+
+def test_batch_keeps_messages_and_timestamps():
+    batch = LogEventBatch()
+    batch.append(b"hello\n", 1000)
+    batch.append(b"", 1001)
+    batch.append("привет".encode("utf-8"), 1002)
+
+    assert len(batch) == 3
+    assert list(batch) == [(b"hello\n", 1000), (b"", 1001), ("привет".encode("utf-8"), 1002)]
+    assert batch.to_cloudwatch_events() == [
+        {"message": "hello\n", "timestamp": 1000},
+        {"message": "", "timestamp": 1001},
+        {"message": "привет", "timestamp": 1002},
+    ]
+
+
+def test_batch_from_messages_uses_single_timestamp():
+    batch = LogEventBatch.from_messages(["a", b"b"], timestamp=42)
+    assert list(batch) == [(b"a", 42), (b"b", 42)]
+
+
+def test_queue_seals_batches_by_event_count():
+    log_queue = LogEventQueue(max_events=2)
+    for index in range(5):
+        log_queue.put(str(index).encode("utf-8"), index)
+
+    assert len(log_queue) == 5
+    batches = [log_queue.get_batch(timeout=0) for _ in range(3)]
+    assert [[message for message, _ in batch] for batch in batches] == [[b"0", b"1"], [b"2", b"3"], [b"4"]]
+    assert log_queue.empty()
+    assert len(log_queue.get_batch(timeout=0)) == 0
+
+
+def test_queue_seals_batches_by_payload_size():
+    log_queue = LogEventQueue(max_bytes=2 * (EVENT_OVERHEAD_BYTES + 10))
+    for _ in range(3):
+        log_queue.put(b"x" * 10)
+
+    assert len(log_queue.get_batch(timeout=0)) == 2
+    assert len(log_queue.get_batch(timeout=0)) == 1
+
+
+def test_invalid_utf8_is_sized_as_sent():
+    message = b"\xff" * 100
+    batch = LogEventBatch()
+    batch.append(message, 1)
+
+    event = batch.to_cloudwatch_events()[0]
+    assert event["message"] == "\\xff" * 100
+    assert batch.payload_size == len(event["message"].encode("utf-8")) + EVENT_OVERHEAD_BYTES
+
+    log_queue = LogEventQueue(max_bytes=2 * (EVENT_OVERHEAD_BYTES + 400))
+    for _ in range(3):
+        log_queue.put(message)
+    assert len(log_queue.get_batch(timeout=0)) == 2
+
+
+def test_queue_sizes_every_line_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(events, "encoded_size", lambda message: calls.append(message) or len(message))
+    log_queue = LogEventQueue()
+    log_queue.put(b"\xff")
+
+    assert calls == [b"\xff"]
+    assert log_queue.get_batch(timeout=0).payload_size == 1 + EVENT_OVERHEAD_BYTES
@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from src import insights
+from src.insights import MISSING_TIMESTAMP, decode_insights_results, parse_insights_timestamp
+
+PAGE = [
+    [
+        {"field": "@timestamp", "value": "2024-07-10 12:34:56.789"},
+        {"field": "@message", "value": "hello"},
+        {"field": "duration", "value": "12.5"},
+        {"field": "@ptr", "value": "a"},
+    ],
+    [
+        {"field": "@timestamp", "value": "2024-07-10 12:35:10.000"},
+        {"field": "@message", "value": "hello"},
+        {"field": "@ptr", "value": "b"},
+    ],
+]
+SECOND_PAGE = [
+    [
+        {"field": "@message", "value": "bye"},
+        {"field": "duration", "value": "3"},
+        {"field": "level", "value": "INFO"},
+    ],
+]
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(insights, "numpy", None)
+    return request.param
+
+
+def test_parse_insights_timestamp():
+    assert parse_insights_timestamp("2024-07-10 12:34:56.789") == 1720614896789
+    assert parse_insights_timestamp("2024-07-10T12:34:56") == 1720614896000
+    assert parse_insights_timestamp("1720614896789") == 1720614896789
+
+
+def test_pages_are_decoded_into_typed_columns(backend):
+    columns = decode_insights_results(PAGE, SECOND_PAGE)
+
+    assert len(columns) == 3
+    assert list(columns["@timestamp"]) == [1720614896789, 1720614910000, MISSING_TIMESTAMP]
+    assert columns["@message"] == ["hello", "hello", "bye"]
+    assert columns["@ptr"] == ["a", "b", None]
+    assert columns["level"] == [None, None, "INFO"]
+    duration = list(columns["duration"])
+    assert duration[0] == 12.5 and math.isnan(duration[1]) and duration[2] == 3.0
+
+
+def test_count_by_time_bucket(backend):
+    columns = decode_insights_results(PAGE, SECOND_PAGE)
+    assert columns.count_by_time_bucket(60) == [(1720614840000, 1), (1720614900000, 1)]
+    with pytest.raises(ValueError):
+        columns.count_by_time_bucket(0.0001)
+
+
+def test_top_messages(backend):
+    columns = decode_insights_results(PAGE, SECOND_PAGE)
+    assert columns.top_messages(1) == [("hello", 2)]
+
+
+@pytest.mark.parametrize("value", ["00123", "1e10", "nan", "inf", "12345678901234567890", " 1", "1."])
+def test_id_like_values_stay_text(backend, value):
+    page = [[{"field": "request_id", "value": value}], [{"field": "request_id", "value": "7"}]]
+    assert decode_insights_results(page)["request_id"] == [value, "7"]
+
+
+def test_dtypes_override_guessing(backend):
+    page = [[{"field": "code", "value": "200"}, {"field": "size", "value": "1e3"}]]
+    columns = decode_insights_results(page, dtypes={"code": "text", "size": "number"})
+
+    assert columns["code"] == ["200"]
+    assert list(columns["size"]) == [1000.0]
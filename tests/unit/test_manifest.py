@@ -0,0 +1,144 @@
+import pytest
+
+from src.main import get_manifest_cli_arguments
+from src.manifest import ManifestRunner, format_report, load_manifest
+from src.validation import DockerCredentials, JobManifest, JobResult
+
+MANIFEST = """
+aws_cloudwatch_group: test-group
+aws_region: test-region
+concurrency: 2
+jobs:
+  - name: first
+    docker_image: bash:latest
+    bash_command: echo first
+  - name: second
+    docker_image: bash:latest
+    bash_command: echo second
+    aws_cloudwatch_stream: second-stream
+"""
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    path = tmp_path / "jobs.yaml"
+    path.write_text(MANIFEST)
+    return str(path)
+
+
+def test_load_manifest(manifest_path):
+    manifest = load_manifest(manifest_path)
+    assert manifest.concurrency == 2
+    assert [job.name for job in manifest.jobs] == ["first", "second"]
+    assert manifest.jobs[1].aws_cloudwatch_stream == "second-stream"
+
+
+def test_load_manifest_rejects_bad_metric_pattern(tmp_path):
+    path = tmp_path / "jobs.yaml"
+    path.write_text(MANIFEST + 'metrics:\n  metrics:\n    - name: errors\n      pattern: "("\n')
+    with pytest.raises(ValueError):
+        load_manifest(str(path))
+
+
+@pytest.mark.parametrize("jobs", [
+    [{"name": "first"}, {"name": "first"}],
+    [{"name": "first"}, {"name": "second", "aws_cloudwatch_stream": "first"}],
+])
+def test_jobs_must_use_their_own_streams(jobs):
+    with pytest.raises(ValueError):
+        JobManifest(
+            aws_cloudwatch_group="test-group",
+            jobs=[{"docker_image": "bash:latest", "bash_command": "echo", **job} for job in jobs],
+        )
+
+
+def test_cli_arguments_override_manifest(manifest_path):
+    manifest, docker_credentials, profiler = get_manifest_cli_arguments([
+        manifest_path,
+        "--concurrency", "5",
+        "--aws-access-key-id", "test-access-key",
+        "--aws-secret-key", "test-secret-key",
+        "--docker-username", "test-username",
+    ])
+    assert manifest.concurrency == 5
+    assert manifest.aws_access_key_id == "test-access-key"
+    assert manifest.aws_region == "test-region"
+    assert docker_credentials.username == "test-username"
+    assert not profiler.enabled
+
+
+def test_raises_exception_if_no_credentials(manifest_path):
+    with pytest.raises(SystemExit):
+        get_manifest_cli_arguments([manifest_path])
+
+
+def test_format_report():
+    report = format_report([
+        JobResult(name="first", aws_cloudwatch_stream="first", exit_code=0, sent_events=3, sent_bytes=90),
+        JobResult(name="second", aws_cloudwatch_stream="second", error="boom"),
+    ])
+    assert "first" in report
+    assert "err" in report
+    assert "error: boom" in report
+
+
+@pytest.fixture
+def runner(manifest_path, mock_container_service, mock_cloudwatch_service, monkeypatch):
+    manifest = load_manifest(manifest_path).model_copy(
+        update={"aws_access_key_id": "test-access-key", "aws_secret_key": "test-secret-key"}
+    )
+    runner = ManifestRunner(manifest, DockerCredentials(), docker_client=object(), cloudwatch_client=object())
+    runner.container_services = []
+    runner.cloud_services = []
+
+    def create_container_service():
+        runner.container_services.append(mock_container_service())
+        return runner.container_services[-1]
+
+    def create_cloud_service(arguments, emf):
+        runner.cloud_services.append(mock_cloudwatch_service(arguments))
+        return runner.cloud_services[-1]
+
+    monkeypatch.setattr(runner, "create_container_service", create_container_service)
+    monkeypatch.setattr(runner, "create_cloud_service", create_cloud_service)
+    return runner
+
+
+def test_run_job_reports_exit_code_and_stats(runner):
+    result = runner.run_job(runner.manifest.jobs[1])
+
+    assert result.name == "second"
+    assert result.aws_cloudwatch_stream == "second-stream"
+    assert runner.cloud_services[0].cloudwatch_stream == "second-stream"
+    assert result.exit_code == 0
+    assert result.error is None
+    assert result.sent_events == 1
+    assert result.sent_bytes == len(b"hello\n") + 26
+
+
+def test_run_job_reports_container_exit_code(runner, monkeypatch):
+    create_container_service = runner.create_container_service
+
+    def failing_container_service():
+        container_service = create_container_service()
+        container_service.exit_code = 3
+        return container_service
+
+    monkeypatch.setattr(runner, "create_container_service", failing_container_service)
+    assert runner.run_job(runner.manifest.jobs[0]).exit_code == 3
+
+
+def test_run_job_reports_failed_shipping(runner, monkeypatch):
+    create_cloud_service = runner.create_cloud_service
+
+    def failing_cloud_service(arguments, emf):
+        cloud_service = create_cloud_service(arguments, emf)
+        cloud_service.success = False
+        return cloud_service
+
+    monkeypatch.setattr(runner, "create_cloud_service", failing_cloud_service)
+    result = runner.run_job(runner.manifest.jobs[0])
+
+    assert result.exit_code is None
+    assert "Failed to send logs" in result.error
+    assert result.sent_events == 0
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from src.metrics import MetricExtractor, bucket_histogram
+from src.validation import MetricsConfig
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_extractor(clock, **config):
+    return MetricExtractor(MetricsConfig(**{
+        "interval": 60,
+        "dimensions": {"service": "api"},
+        "metrics": [
+            {"name": "errors", "pattern": "ERROR"},
+            {"name": "latency", "type": "histogram", "pattern": r"took (?P<value>[0-9.]+)ms", "unit": "Milliseconds"},
+            {"name": "duration", "type": "histogram", "json_field": "http.duration"},
+        ],
+        **config,
+    }), clock=clock)
+
+
+def test_interval_is_aggregated_into_one_emf_event():
+    clock = FakeClock()
+    extractor = make_extractor(clock)
+    for latency in range(1, 101):
+        extractor.process(f"request took {latency}ms\n".encode("utf-8"))
+    extractor.process(b"ERROR something broke\n")
+    extractor.process(b'{"http": {"duration": 7}}\n')
+    extractor.process(b"not interesting\n")
+
+    assert extractor.flush_due() is None
+    clock.now += 60
+    event = json.loads(extractor.flush_due())
+
+    assert event["service"] == "api"
+    assert event["errors"] == 1
+    assert event["latency"] == {"Values": [float(value) for value in range(1, 101)], "Counts": [1] * 100}
+    assert event["duration"] == {"Values": [7.0], "Counts": [1]}
+    directive = event["_aws"]["CloudWatchMetrics"][0]
+    assert event["_aws"]["Timestamp"] == 1060000
+    assert directive["Dimensions"] == [["service"]]
+    assert directive["Metrics"] == [
+        {"Name": "errors", "Unit": "Count"},
+        {"Name": "latency", "Unit": "Milliseconds"},
+        {"Name": "duration", "Unit": "None"},
+    ]
+    assert extractor.flush() is None
+
+
+def test_matched_lines_can_be_dropped():
+    extractor = make_extractor(FakeClock(), matched_lines="drop")
+    assert extractor.process(b"ERROR something broke\n") is False
+    assert extractor.process(b"not interesting\n") is True
+
+
+def test_matched_lines_can_be_sampled():
+    extractor = make_extractor(FakeClock(), matched_lines="sample", sample_rate=0)
+    assert extractor.process(b"ERROR something broke\n") is False
+
+
+@pytest.mark.parametrize("rule", [
+    {"name": "latency", "type": "histogram", "pattern": "took"},
+    {"name": "errors", "pattern": "("},
+])
+def test_bad_patterns_are_rejected_with_the_config(rule):
+    with pytest.raises(ValueError):
+        MetricsConfig(metrics=[rule])
+
+
+def test_non_finite_values_are_ignored():
+    extractor = MetricExtractor(MetricsConfig(metrics=[
+        {"name": "lat", "type": "histogram", "pattern": r"lat=(?P<value>\S+)"},
+        {"name": "duration", "type": "histogram", "json_field": "duration"},
+    ]))
+    for line in (b"lat=nan", b"lat=inf", b"lat=-Infinity", b"lat=5", b'{"duration": NaN}', b'{"duration": Infinity}'):
+        extractor.process(line)
+
+    event = json.loads(extractor.flush(), parse_constant=pytest.fail)
+    assert event["lat"] == {"Values": [5.0], "Counts": [1]}
+    assert "duration" not in event
+
+
+def test_histogram_is_bucketed_to_100_values():
+    counts = {float(value): 1 + value % 3 for value in range(1000)}
+    values, value_counts = bucket_histogram(counts)
+
+    assert len(values) == 100
+    assert values == sorted(values)
+    assert sum(value_counts) == sum(counts.values())
+    assert sum(value * count for value, count in zip(values, value_counts)) == pytest.approx(
+        sum(value * count for value, count in counts.items())
+    )
+    assert max(value_counts) - min(value_counts) <= 4
+
+
+@pytest.mark.parametrize("metrics, dimensions", [
+    ([{"name": "lat", "type": "histogram", "pattern": "(?P<value>[0-9]+)"}, {"name": "lat", "pattern": "x"}], {}),
+    ([{"name": "service", "pattern": "x"}], {"service": "api"}),
+    ([{"name": "_aws", "pattern": "x"}], {}),
+])
+def test_metric_names_must_be_unique(metrics, dimensions):
+    with pytest.raises(ValueError):
+        MetricsConfig(metrics=metrics, dimensions=dimensions)
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.profiling import Profiler
+
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    profiler = Profiler(str(tmp_path / "profile"), enabled=False)
+    profiler.start()
+    with profiler.stage("send_logs"):
+        pass
+    assert list(profiler.timed_iter("read", [1, 2])) == [1, 2]
+    profiler.stop()
+
+    assert profiler.stages == {}
+    assert not os.path.exists(tmp_path / "profile")
+
+
+def test_stages_are_timed():
+    profiler = Profiler(enabled=False)
+    profiler.enabled = True
+    for _ in range(3):
+        with profiler.stage("send_logs"):
+            pass
+    assert list(profiler.timed_iter("logging_loop.read", iter([b"a", b"b"]))) == [b"a", b"b"]
+
+    assert profiler.stages["send_logs"].count == 3
+    # the final step which exhausts the iterator is timed as well
+    assert profiler.stages["logging_loop.read"].count == 3
+
+
+def test_profile_files_are_written(tmp_path):
+    output_dir = str(tmp_path / "profile")
+    profiler = Profiler(output_dir, sample_interval=0.001, snapshot_interval=0.01)
+    profiler.start()
+    with profiler.stage("batcher"):
+        time.sleep(0.05)
+    profiler.stop()
+
+    assert sorted(name for name in os.listdir(output_dir) if not name.startswith("tracemalloc-")) == [
+        "stacks.collapsed",
+        "summary.txt",
+    ]
+    assert profiler.snapshot_count > 2
+    for index in range(profiler.snapshot_count):
+        assert os.path.exists(os.path.join(output_dir, f"tracemalloc-{index}.snapshot"))
+    with open(os.path.join(output_dir, "stacks.collapsed")) as stacks_file:
+        assert all(line.rsplit(" ", 1)[1].strip().isdigit() for line in stacks_file)
+    with open(os.path.join(output_dir, "summary.txt")) as summary_file:
+        summary = summary_file.read()
+    assert "batcher" in summary
+    assert "largest growth since the first snapshot" in summary
+
+
+def test_idle_threads_do_not_dominate_cpu_samples(tmp_path):
+    profiler = Profiler(str(tmp_path / "profile"), sample_interval=0.005)
+    if not profiler.cpu_sampling:
+        pytest.skip("per-thread cpu time is not available")
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            sum(range(1000))
+
+    def idle():
+        stop.wait()
+
+    threads = [threading.Thread(target=busy)] + [threading.Thread(target=idle) for _ in range(4)]
+    profiler.start()
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    profiler.stop()
+
+    busy_time = sum(count for stack, count in profiler.stacks.items() if "busy (" in stack)
+    idle_time = sum(count for stack, count in profiler.stacks.items() if "idle (" in stack)
+    assert busy_time > 10 * idle_time
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import time
+from typing import Optional
+
+import pytest
+
+from src.erorrs import CloudLogsSendError
+from src.metrics import MetricExtractor
+from src.services import IAsyncCloudMonitoringService
+from src.usecases import AsyncAwsLogsUseCase, AwsCloudWatchUseCase
+from src.validation import MetricsConfig, ProgramArguments
+
+
+@pytest.fixture
+def program_arguments():
+    return ProgramArguments(
+        docker_image="test-image",
+        bash_command="echo hello",
+        aws_cloudwatch_group="test-group",
+        aws_cloudwatch_stream="test-stream",
+        aws_access_key_id="test-access-key",
+        aws_secret_key="test-secret-key",
+        aws_region="test-region",
+    )
+
+
+class AsyncCloudService(IAsyncCloudMonitoringService):
+    def __init__(self, success: bool = True):
+        self.sent = []
+        self.success = success
+
+    async def send_logs(self, logs) -> bool:
+        if self.success:
+            self.sent.append(logs)
+        return self.success
+
+    async def get_logs(self, start_time: int, end_time: int, max_logs: Optional[int] = 100) -> str:
+        return ""
+
+
+def sent_messages(cloud_service):
+    return [message for batch in cloud_service.sent for message, _ in batch]
+
+
+def test_streamed_logs_are_not_resent(mock_container_service, mock_cloudwatch_service, program_arguments):
+    container_service = mock_container_service()
+    container_service.logs = [b"first\n", b"second\n"]
+    cloud_service = mock_cloudwatch_service(program_arguments)
+    usecase = AwsCloudWatchUseCase(container_service, cloud_service, program_arguments)
+
+    usecase.loop("test-image", "echo hello")
+
+    assert usecase.logs_streamed
+    assert sent_messages(cloud_service) == [b"first\n", b"second\n"]
+    assert usecase.sent_events == 2
+    assert usecase.sent_bytes == len(b"first\n") + len(b"second\n") + 2 * 26
+
+
+def test_logs_of_exited_container_are_sent_once(mock_container_service, mock_cloudwatch_service, program_arguments):
+    container_service = mock_container_service()
+    container_service.started_running = False
+    cloud_service = mock_cloudwatch_service(program_arguments)
+    usecase = AwsCloudWatchUseCase(container_service, cloud_service, program_arguments)
+
+    usecase.loop("test-image", "echo hello")
+
+    assert not usecase.logs_streamed
+    assert sent_messages(cloud_service) == [b"hello\n"]
+    assert usecase.sent_events == 1
+
+
+def test_failed_send_is_raised(mock_container_service, mock_cloudwatch_service, program_arguments):
+    cloud_service = mock_cloudwatch_service(program_arguments)
+    cloud_service.success = False
+    usecase = AwsCloudWatchUseCase(mock_container_service(), cloud_service, program_arguments)
+
+    with pytest.raises(CloudLogsSendError):
+        usecase.loop("test-image", "echo hello")
+    assert usecase.sent_events == 0
+
+
+def test_async_sender_waits_for_the_last_lines(mock_container_service, program_arguments):
+    class SlowTailContainerService(mock_container_service):
+        def get_logs(self):
+            self.logs_read = True
+            yield b"first line\n"
+            # the container counts as stopped already, the stream still has a chunk
+            time.sleep(0.3)
+            yield b"last line\n"
+
+    cloud_service = AsyncCloudService()
+    usecase = AsyncAwsLogsUseCase(SlowTailContainerService(), cloud_service, program_arguments)
+
+    asyncio.run(usecase.loop("test-image", "echo hello"))
+
+    assert usecase.queue.empty()
+    assert sent_messages(cloud_service) == [b"first line\n", b"last line\n"]
+
+
+def test_async_failed_send_is_raised(mock_container_service, program_arguments):
+    class FailingCloudService(AsyncCloudService):
+        async def send_logs(self, logs) -> bool:
+            raise RuntimeError("PutLogEvents failed")
+
+    usecase = AsyncAwsLogsUseCase(mock_container_service(), FailingCloudService(), program_arguments)
+    with pytest.raises(RuntimeError):
+        asyncio.run(usecase.loop("test-image", "echo hello"))
+
+    usecase = AsyncAwsLogsUseCase(mock_container_service(), AsyncCloudService(success=False), program_arguments)
+    with pytest.raises(CloudLogsSendError):
+        asyncio.run(usecase.loop("test-image", "echo hello"))
+
+
+@pytest.fixture
+def metrics():
+    return MetricExtractor(MetricsConfig(matched_lines="drop", metrics=[{"name": "errors", "pattern": "ERROR"}]))
+
+
+def assert_errors_aggregated(messages):
+    assert messages[:-1] == [b"ok\n"]
+    assert json.loads(messages[-1])["errors"] == 2
+
+
+def test_metrics_replace_matched_lines(mock_container_service, mock_cloudwatch_service, program_arguments, metrics):
+    container_service = mock_container_service()
+    container_service.logs = [b"ERROR one\n", b"ok\n", b"ERROR two\n"]
+    cloud_service = mock_cloudwatch_service(program_arguments)
+    usecase = AwsCloudWatchUseCase(container_service, cloud_service, program_arguments, metrics=metrics)
+
+    usecase.loop("test-image", "echo hello")
+
+    assert_errors_aggregated(sent_messages(cloud_service))
+
+
+def test_async_metrics_replace_matched_lines(mock_container_service, program_arguments, metrics):
+    container_service = mock_container_service()
+    container_service.logs = [b"ERROR one\n", b"ok\n", b"ERROR two\n"]
+    cloud_service = AsyncCloudService()
+    usecase = AsyncAwsLogsUseCase(container_service, cloud_service, program_arguments, metrics=metrics)
+
+    asyncio.run(usecase.loop("test-image", "echo hello"))
+
+    assert_errors_aggregated(sent_messages(cloud_service))